@@ -1,18 +1,33 @@
 # mcp_server.py
 from __future__ import annotations
 
-import json
+import asyncio
+import atexit
+import contextlib
+import functools
+import hashlib
 import logging
+import math
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple
-from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
-from pymongo import MongoClient, DESCENDING
-from pymongo.errors import PyMongoError
+import fastjsonschema
+import orjson
+from cachetools import TTLCache
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.collection import Collection
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
 
 import mcp.types as types
 from mcp.server.fastmcp import FastMCP
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 
 # ============================================================
 # Config & Constants
@@ -26,12 +41,24 @@ MONGO_COLL = os.environ.get("MONGO_COLL", "news")
 
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
 
-ALLOWED_QUERY_KEYS = {
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_TIME_MS = int(os.environ.get("MONGO_MAX_TIME_MS", "2000"))  # 0 disables
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_COMPRESSORS = [c.strip() for c in os.environ.get("MONGO_COMPRESSORS", "zstd,zlib").split(",") if c.strip()]
+
+ENSURE_INDEXES = os.environ.get("ENSURE_INDEXES", "1") not in ("0", "false", "False")
+
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "30"))  # seconds; 0 disables
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "256"))  # 0 disables
+
+ALLOWED_QUERY_KEYS = frozenset({
     "sentiment",              # "Positive" | "Neutral" | "Negative"
     "symbolmap.NSE",          # exact NSE symbol, e.g., "RELIANCE"
     "symbolmap.Company_Name", # {"$regex": "...", "$options": "i"}
     "impact score",           # comparison operators ($gt, $gte, $lt, $lte, $eq)
-}
+})
+_ALLOWED_QUERY_KEYS_STR = ", ".join(sorted(ALLOWED_QUERY_KEYS))
 
 # ============================================================
 # Logging
@@ -83,6 +110,31 @@ WIDGET = NewsWidget(
     html_path=os.path.join(os.path.dirname(__file__), "..", "components", "news-impact", "index.html"),
 )
 
+# Bound once so handlers read plain module globals
+_TEMPLATE_URI, _INVOKING, _INVOKED, _TITLE = WIDGET.template_uri, WIDGET.invoking, WIDGET.invoked, WIDGET.title
+
+# Shared meta mappings are read-only views; pydantic copies them into plain dicts per model.
+# Only the top level can be frozen: pydantic cannot serialize a nested mappingproxy.
+
+# Advertise tool but keep widget locked; enable only after non-empty results
+_TOOL_META: Mapping[str, Any] = MappingProxyType({
+    "openai/outputTemplate": _TEMPLATE_URI,
+    "openai/toolInvocation/invoking": _INVOKING,
+    "openai/toolInvocation/invoked": _INVOKED,
+    "openai/widgetAccessible": False,
+    "annotations": {"readOnlyHint": True, "destructiveHint": False, "openWorldHint": False},
+})
+
+# Result meta sent once a query returns items
+_RESULT_META_WITH_WIDGET: Mapping[str, Any] = MappingProxyType({
+    "openai/widgetAccessible": True,
+    "openai/resultCanProduceWidget": True,
+    "openai/outputTemplate": _TEMPLATE_URI,
+    "openai/toolInvocation/invoking": _INVOKING,
+    "openai/toolInvocation/invoked": _INVOKED,
+    "openai/widgetId": WIDGET.identifier,  # optional helper for hosts
+})
+
 # ============================================================
 # FastMCP App
 # ============================================================
@@ -92,6 +144,8 @@ mcp = FastMCP(
     sse_path="/mcp",
     message_path="/mcp/messages",
     stateless_http=True,
+    # plain application/json replies instead of one-event SSE streams, so GZipMiddleware can compress them
+    json_response=True,
 )
 
 # ============================================================
@@ -114,7 +168,7 @@ NEWS_QUERY_SCHEMA: Dict[str, Any] = {
                 "symbolmap.Company_Name": {
                     "type": "object",
                     "properties": {
-                        "$regex": {"type": "string"},
+                        "$regex": {"type": "string", "minLength": 1},
                         "$options": {"type": "string", "enum": ["i"]},
                     },
                     "required": ["$regex", "$options"],
@@ -147,12 +201,186 @@ NEWS_QUERY_SCHEMA: Dict[str, Any] = {
     "additionalProperties": False,
 }
 
+# Compiled once; the generated validator also applies the "limit" default.
+_VALIDATE_ARGS = fastjsonschema.compile(NEWS_QUERY_SCHEMA)
+_ALLOWED_ARGS_STR = ", ".join(NEWS_QUERY_SCHEMA["properties"])
+
+# ============================================================
+# Mongo Client (shared, lazily created)
+# ============================================================
+
+# dt_tm-sorted top-K reads; equality keys lead so the sort is served by the index
+_IDX_DT = [("dt_tm", DESCENDING)]
+_IDX_SENTIMENT_DT = [("sentiment", ASCENDING), ("dt_tm", DESCENDING)]
+_IDX_SYMBOL_DT = [("symbolmap.NSE", ASCENDING), ("dt_tm", DESCENDING)]
+_IDX_SENTIMENT_SYMBOL_DT = [("sentiment", ASCENDING), ("symbolmap.NSE", ASCENDING), ("dt_tm", DESCENDING)]
+# impact score is a range filter: keep it after the sort key so the dt_tm walk filters on index keys
+_IDX_DT_SCORE = [("dt_tm", DESCENDING), ("impact score", ASCENDING)]
+# $regex can be evaluated against index keys, avoiding a document fetch per non-match
+_IDX_COMPANY = [("symbolmap.Company_Name", ASCENDING)]
+_INDEXES = (
+    _IDX_DT,
+    _IDX_SENTIMENT_DT,
+    _IDX_SYMBOL_DT,
+    _IDX_SENTIMENT_SYMBOL_DT,
+    _IDX_DT_SCORE,
+    _IDX_COMPANY,
+)
+_EQUALITY_KEYS = frozenset({"sentiment", "symbolmap.NSE"})
+
+# Runs after $sort/$limit so those still collapse into an index-backed top-K scan; emits the
+# widget's item shape directly ($ifNull keeps absent fields as "" / null like the old loop did)
+_PROJECT_ITEMS = {
+    "$project": {
+        "_id": 0,
+        "company": {"$ifNull": ["$symbolmap.Company_Name", ""]},
+        "symbol": {"$ifNull": ["$symbolmap.NSE", ""]},
+        "dt": {"$ifNull": ["$dt_tm", None]},  # datetimes are ISO-encoded by pydantic-core on the way out
+        "summary": {"$ifNull": ["$short summary", ""]},
+        "impact": {"$ifNull": ["$impact", None]},
+        "score": {"$ifNull": ["$impact score", None]},
+        "sentiment": {"$ifNull": ["$sentiment", None]},
+        "link": {"$ifNull": ["$news link", ""]},
+    }
+}
+
+_MONGO_CLIENT: Optional[MongoClient] = None
+_MONGO_COLL: Optional[Collection] = None
+_MONGO_LOCK = threading.Lock()
+# Key patterns confirmed by index_information(); only these are ever hinted
+_HINTABLE: frozenset = frozenset()
+_INDEX_SETUP_MAX_DELAY = 60.0  # seconds between index-setup retries while Mongo is down
+
+# One thread per pooled connection, so in-flight queries are bounded by the pool, not the default executor.
+# maxPoolSize=0 means "no limit" to pymongo; the executor still needs a bound, so use pymongo's default of 100.
+_MONGO_THREADS = MONGO_MAX_POOL_SIZE if MONGO_MAX_POOL_SIZE > 0 else 100
+_MONGO_EXECUTOR = ThreadPoolExecutor(max_workers=_MONGO_THREADS, thread_name_prefix="mongo")
+
+def _get_coll() -> Collection:
+    """Return the news collection, creating the pooled client on first use."""
+    global _MONGO_CLIENT, _MONGO_COLL
+    if _MONGO_COLL is not None:
+        return _MONGO_COLL
+    with _MONGO_LOCK:
+        if _MONGO_COLL is None:
+            if _MONGO_CLIENT is None:
+                # connect=False defers the handshake to the first operation
+                _MONGO_CLIENT = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=min(MONGO_MIN_POOL_SIZE, MONGO_MAX_POOL_SIZE),
+                    appname="news-impact-python",
+                    # fail fast when Mongo is down instead of holding a worker thread for pymongo's 30s default
+                    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    # summaries/impact text compress well; the server picks the first compressor it supports
+                    compressors=MONGO_COMPRESSORS,
+                    # naive datetimes keep the baseline "dt" format (no offset) the widget already renders
+                    tz_aware=False,
+                    connect=False,
+                )
+                logger.info("[MONGO] client created for %s.%s", MONGO_DB, MONGO_COLL)
+            _MONGO_COLL = _MONGO_CLIENT[MONGO_DB][MONGO_COLL]
+            # Index setup stays off the request path (and off this lock); until it has listed the
+            # existing indexes _HINTABLE is empty, so queries simply run unhinted.
+            threading.Thread(
+                target=_index_setup_loop, args=(_MONGO_COLL,), name="mongo-index-setup", daemon=True
+            ).start()
+    return _MONGO_COLL
+
+def _index_setup_loop(coll: Collection) -> None:
+    """Ensure and discover indexes once, backing off while Mongo is unreachable."""
+    global _HINTABLE
+    delay = 1.0
+    while _MONGO_COLL is coll:  # a reset client (fork) starts its own loop
+        try:
+            if ENSURE_INDEXES:
+                _ensure_indexes(coll)
+            hintable = _load_hintable_indexes(coll)
+        except ConnectionFailure as e:
+            logger.warning("[MONGO] index setup deferred, retrying in %.0fs: %s", delay, e)
+            time.sleep(delay)
+            delay = min(delay * 2, _INDEX_SETUP_MAX_DELAY)
+            continue
+        if _MONGO_COLL is coll:
+            _HINTABLE = hintable
+            logger.info("[MONGO] index setup done; %d index(es) available for hints", len(hintable))
+        return
+
+def _ensure_indexes(coll: Collection) -> None:
+    """Create the read indexes (idempotent); each failure is logged and the rest still run."""
+    for keys in _INDEXES:
+        if _MONGO_COLL is not coll:
+            return  # client closed or reset meanwhile
+        try:
+            coll.create_index(keys)
+        except ConnectionFailure:
+            raise
+        except PyMongoError as e:
+            if _MONGO_COLL is coll:
+                logger.warning("[MONGO] could not ensure index %s: %s", keys, e)
+
+def _load_hintable_indexes(coll: Collection) -> frozenset:
+    """Key patterns that exist; Mongo fails a query whose hint names a missing index."""
+    try:
+        info = coll.index_information()
+    except ConnectionFailure:
+        raise
+    except PyMongoError as e:
+        if _MONGO_COLL is coll:
+            logger.warning("[MONGO] could not list indexes, queries run unhinted: %s", e)
+        info = {}
+    return frozenset(tuple(spec["key"]) for spec in info.values())
+
+@atexit.register
+def _close_mongo_client() -> None:
+    global _MONGO_COLL
+    _MONGO_COLL = None  # stops the index-setup thread
+    if _MONGO_CLIENT is not None:
+        _MONGO_CLIENT.close()
+
+def _reset_mongo_client_after_fork() -> None:
+    """Forked workers must not reuse the parent's sockets; the next call builds a fresh client."""
+    global _MONGO_CLIENT, _MONGO_COLL, _MONGO_LOCK, _MONGO_EXECUTOR, _HINTABLE
+    _MONGO_CLIENT = None
+    _MONGO_COLL = None
+    _HINTABLE = frozenset()
+    _MONGO_LOCK = threading.Lock()
+    _MONGO_EXECUTOR = ThreadPoolExecutor(max_workers=_MONGO_THREADS, thread_name_prefix="mongo")
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_mongo_client_after_fork)
+
+# ============================================================
+# Query Cache (identical query+limit within the TTL)
+# ============================================================
+
+_QUERY_CACHE_ENABLED = QUERY_CACHE_TTL > 0 and QUERY_CACHE_SIZE > 0
+_QUERY_CACHE: TTLCache = TTLCache(maxsize=max(QUERY_CACHE_SIZE, 1), ttl=max(QUERY_CACHE_TTL, 0))
+_QUERY_CACHE_LOCK = threading.Lock()
+
+_CacheKey = Tuple[bytes, int]
+
+def _query_cache_key(query: Dict[str, Any], limit: int) -> _CacheKey:
+    # query is schema-validated JSON, so orjson needs no default= fallback
+    return orjson.dumps(query, option=orjson.OPT_SORT_KEYS), limit
+
+def _query_cache_get(key: _CacheKey) -> Optional[List[Dict[str, Any]]]:
+    with _QUERY_CACHE_LOCK:
+        return _QUERY_CACHE.get(key)
+
+def _query_cache_put(key: _CacheKey, items: List[Dict[str, Any]]) -> None:
+    if not _QUERY_CACHE_ENABLED:
+        return  # TTLCache(maxsize=0) would raise "value too large" on every put
+    with _QUERY_CACHE_LOCK:
+        _QUERY_CACHE[key] = items
+
 # ============================================================
 # Helpers
 # ============================================================
 
+@functools.lru_cache(maxsize=1)
 def _load_widget_html() -> str:
-    """Load component HTML; return a simple fallback if missing."""
+    """Load component HTML once per process; return a simple fallback if missing."""
     path = os.path.abspath(WIDGET.html_path)
     if not os.path.exists(path):
         logger.warning("Widget HTML not found at %s", path)
@@ -165,167 +393,203 @@ def _load_widget_html() -> str:
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
-def _tool_descriptor_meta() -> Dict[str, Any]:
-    """Advertise tool but keep widget locked; enable only after non-empty results."""
-    return {
-        "openai/outputTemplate": WIDGET.template_uri,
-        "openai/toolInvocation/invoking": WIDGET.invoking,
-        "openai/toolInvocation/invoked": WIDGET.invoked,
-        "openai/widgetAccessible": False,
-        "annotations": {"readOnlyHint": True, "destructiveHint": False, "openWorldHint": False},
-    }
+class _LazyJSON:
+    """Log argument that serializes (via orjson) only if the record is emitted."""
+    __slots__ = ("obj", "maxlen")
+
+    def __init__(self, obj: Any, maxlen: Optional[int] = None):
+        self.obj = obj
+        self.maxlen = maxlen
 
-def _to_iso(x):
-    if isinstance(x, datetime):
+    def __str__(self) -> str:
         try:
-            return x.isoformat()
+            s = orjson.dumps(self.obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
         except Exception:
-            return str(x)
-    return x if (x is None or isinstance(x, (str, int, float, bool))) else str(x)
+            s = str(self.obj)
+        if self.maxlen is not None and len(s) > self.maxlen:
+            return s[:self.maxlen] + " …"
+        return s
 
 def _preview(obj, maxlen=600):
-    try:
-        s = json.dumps(obj, ensure_ascii=False, default=str)
-    except Exception:
-        s = str(obj)
-    return (s[:maxlen] + " …") if len(s) > maxlen else s
+    return _LazyJSON(obj, maxlen)
+
+def _coerce_impact_score(args: Any) -> None:
+    """Models sometimes quote numbers ("7"); turn them into floats so the filter can match."""
+    query = args.get("query") if isinstance(args, dict) else None
+    cmp_obj = query.get("impact score") if isinstance(query, dict) else None
+    if not isinstance(cmp_obj, dict):
+        return
+    for op, v in cmp_obj.items():
+        if isinstance(v, str):
+            try:
+                f = float(v)
+            except ValueError:
+                continue  # left as-is; the schema reports it
+            # "nan"/"inf" would pass as numbers and all encode to null in the cache key
+            if math.isfinite(f):
+                cmp_obj[op] = f
 
 def _validate_and_normalize_args(args: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
-    if not isinstance(args, dict):
-        raise ValidationError("Arguments must be an object.")
-    if "query" not in args:
-        raise ValidationError("Field 'query' is required.")
-
-    query = args.get("query") or {}
-    if not isinstance(query, dict):
-        raise ValidationError("'query' must be an object.")
-
-    unknown = [k for k in query.keys() if k not in ALLOWED_QUERY_KEYS]
-    if unknown:
-        raise ValidationError(
-            "Invalid query keys: " + ", ".join(unknown) +
-            ". Allowed: " + ", ".join(sorted(ALLOWED_QUERY_KEYS))
-        )
-
-    if "sentiment" in query and query["sentiment"] not in ("Positive", "Neutral", "Negative"):
-        raise ValidationError("sentiment must be one of: Positive, Neutral, Negative.")
-
-    if "symbolmap.Company_Name" in query:
-        sub = query["symbolmap.Company_Name"]
-        if not isinstance(sub, dict):
-            raise ValidationError("symbolmap.Company_Name must be an object.")
-        if set(sub.keys()) != {"$regex", "$options"}:
-            raise ValidationError("symbolmap.Company_Name must have keys: $regex and $options.")
-        if not isinstance(sub.get("$regex"), str) or not sub.get("$regex"):
-            raise ValidationError("symbolmap.Company_Name.$regex must be a non-empty string.")
-        if sub.get("$options") != "i":
-            raise ValidationError("symbolmap.Company_Name.$options must be 'i'.")
-
-    if "impact score" in query:
-        cmp_obj = query["impact score"]
-        if not isinstance(cmp_obj, dict) or not cmp_obj:
-            raise ValidationError("impact score must be an object with comparison operator(s).")
-        allowed_ops = {"$gt", "$gte", "$lt", "$lte", "$eq"}
-        if any(op not in allowed_ops for op in cmp_obj.keys()):
-            raise ValidationError("impact score uses only: $gt, $gte, $lt, $lte, $eq.")
-        if not all(isinstance(v, (int, float)) for v in cmp_obj.values()):
-            raise ValidationError("impact score operator values must be numbers.")
-
-    limit = args.get("limit", 10)
+    """Validate against the compiled NEWS_QUERY_SCHEMA; fills in the default limit."""
+    _coerce_impact_score(args)
     try:
-        limit = int(limit)
-    except Exception:
-        raise ValidationError("'limit' must be an integer between 1 and 50.")
-    if not (1 <= limit <= 50):
-        raise ValidationError("'limit' must be between 1 and 50.")
-
-    return query, limit
+        args = _VALIDATE_ARGS(args)
+    except fastjsonschema.JsonSchemaException as e:
+        if e.name == "data.query" and e.rule == "additionalProperties":
+            unknown = sorted(e.value.keys() - ALLOWED_QUERY_KEYS)
+            raise ValidationError(
+                "Invalid query keys: " + ", ".join(unknown) + ". Allowed: " + _ALLOWED_QUERY_KEYS_STR
+            )
+        if e.name == "data" and e.rule == "required":
+            missing = [k for k in e.rule_definition if k not in e.value]
+            raise ValidationError(f"Field '{missing[0]}' is required.")
+        if e.name == "data" and e.rule == "additionalProperties":
+            unknown = sorted(e.value.keys() - NEWS_QUERY_SCHEMA["properties"].keys())
+            raise ValidationError(
+                "Unknown arguments: " + ", ".join(unknown) + ". Allowed: " + _ALLOWED_ARGS_STR
+            )
+        msg = e.message
+        if msg.startswith("data."):
+            msg = msg[len("data."):]
+        elif msg.startswith("data "):
+            msg = "arguments " + msg[len("data "):]
+        raise ValidationError(msg)
+    # the schema's "integer" also accepts 5.0; pymongo requires a real int for batchSize/$limit
+    return args["query"], int(args["limit"])
+
+def _pick_hint(query: Dict[str, Any]) -> Optional[List[Tuple[str, int]]]:
+    """Index for the sorted top-K walk; None leaves the choice to the planner."""
+    if "symbolmap.Company_Name" in query:
+        return None  # rare names favour a key scan of _IDX_COMPANY, common ones the dt_tm walk
+    if not _EQUALITY_KEYS.intersection(query):
+        # no equality selector: walk dt_tm so the scan stops after 'limit' hits
+        hint = _IDX_DT_SCORE if "impact score" in query else _IDX_DT
+    elif len(query) == 1:
+        hint = _IDX_SENTIMENT_DT if "sentiment" in query else _IDX_SYMBOL_DT
+    else:
+        return None
+    return hint if tuple(hint) in _HINTABLE else None
 
 def _fetch_from_mongo(query: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
-    projection = {
-        "_id": 0,
-        "symbolmap.Company_Name": 1,
-        "symbolmap.NSE": 1,
-        "dt_tm": 1,
-        "short summary": 1,
-        "impact": 1,
-        "impact score": 1,
-        "sentiment": 1,
-        "news link": 1,
-    }
+    """Run the query; the pipeline returns documents already shaped as widget items."""
+    global _HINTABLE
+    pipeline = [{"$match": query}, {"$sort": {"dt_tm": DESCENDING}}, {"$limit": limit}, _PROJECT_ITEMS]
+    options: Dict[str, Any] = {"batchSize": limit, "allowDiskUse": False}
+    if MONGO_MAX_TIME_MS > 0:
+        options["maxTimeMS"] = MONGO_MAX_TIME_MS
     try:
-        client = MongoClient(MONGO_URI)
-        coll = client[MONGO_DB][MONGO_COLL]
-        cur = coll.find(query, projection).sort("dt_tm", DESCENDING).limit(limit)
-        docs = list(cur)
-        logger.info("[TOOL] Mongo query returned %d doc(s)", len(docs))
-        return docs
+        coll = _get_coll()
+        hint = _pick_hint(query)
+        if hint is not None:
+            options["hint"] = dict(hint)  # aggregate takes the key document, not a (key, dir) list
+        try:
+            items = list(coll.aggregate(pipeline, **options))
+        except OperationFailure as e:
+            if hint is None or "hint" not in str(e):
+                raise
+            # index dropped since setup: stop hinting it and let the planner choose
+            logger.warning("[MONGO] hinted index %s unavailable, retrying unhinted: %s", hint, e)
+            _HINTABLE = _HINTABLE - {tuple(hint)}
+            del options["hint"]
+            items = list(coll.aggregate(pipeline, **options))
+        logger.info("[TOOL] Mongo query returned %d doc(s)", len(items))
+        return items
     except PyMongoError as e:
         raise MongoQueryError(f"MongoDB error: {e}")
 
-def _normalize_docs(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    normalized: List[Dict[str, Any]] = []
-    for d in docs:
-        symbolmap = d.get("symbolmap") or {}
-        normalized.append(
-            {
-                "company": symbolmap.get("Company_Name", "") or "",
-                "symbol": symbolmap.get("NSE", "") or "",
-                "dt": _to_iso(d.get("dt_tm")),
-                "summary": d.get("short summary", "") or "",
-                "impact": d.get("impact"),
-                "score": d.get("impact score"),
-                "sentiment": d.get("sentiment"),
-                "link": d.get("news link", "") or "",
-            }
-        )
-    return normalized
+# In-flight fetches keyed like the cache, so a burst of identical misses runs one query
+_INFLIGHT: Dict[_CacheKey, "asyncio.Future[List[Dict[str, Any]]]"] = {}
+
+async def _fetch_items(query: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    """Cached fetch; concurrent callers with the same (query, limit) share one Mongo call."""
+    key = _query_cache_key(query, limit)
+    items = _query_cache_get(key)
+    if items is not None:
+        logger.info("[TOOL] query cache hit (%d item(s))", len(items))
+        return items
+    fut = _INFLIGHT.get(key)
+    if fut is None:
+        # Blocking driver call runs off the event loop so other requests keep flowing
+        fut = asyncio.get_running_loop().run_in_executor(_MONGO_EXECUTOR, _fetch_from_mongo, query, limit)
+        _INFLIGHT[key] = fut
+        fut.add_done_callback(lambda f: _on_fetch_done(key, f))
+    else:
+        logger.info("[TOOL] joining in-flight query")
+    # shield: one caller going away must not cancel the query the others await
+    return await asyncio.shield(fut)
+
+def _on_fetch_done(key: _CacheKey, fut: "asyncio.Future[List[Dict[str, Any]]]") -> None:
+    _INFLIGHT.pop(key, None)
+    if not fut.cancelled() and fut.exception() is None:
+        _query_cache_put(key, fut.result())
 
 # ============================================================
 # MCP: Tools & Resources
 # ============================================================
 
+_NO_RESULTS_CONTENT = [
+    types.TextContent(type="text", text="No news matched your query. Widget not rendered.")
+]
+
+# One prebuilt summary per possible result count (the schema caps limit)
+_FETCHED_CONTENT = [
+    [types.TextContent(type="text", text=f"Fetched {n} item(s) for News Impact.")]
+    for n in range(NEWS_QUERY_SCHEMA["properties"]["limit"]["maximum"] + 1)
+]
+
+# Constant per process: built once, returned on every tools/list
+_TOOLS: List[types.Tool] = [
+    types.Tool(
+        name="news-impact",
+        title=_TITLE,
+        description="Query MongoDB and (only if results are found) render the News Impact carousel.",
+        inputSchema=NEWS_QUERY_SCHEMA,
+        _meta=_TOOL_META,
+    )
+]
+
 @mcp._mcp_server.list_tools()
 async def _list_tools() -> List[types.Tool]:
-    return [
-        types.Tool(
-            name="news-impact",
-            title=WIDGET.title,
-            description="Query MongoDB and (only if results are found) render the News Impact carousel.",
-            inputSchema=NEWS_QUERY_SCHEMA,
-            _meta=_tool_descriptor_meta(),
-        )
-    ]
+    return _TOOLS
 
-async def _handle_read_resource(req: types.ReadResourceRequest) -> types.ServerResult:
-    uri = str(req.params.uri)
-    logger.info("[READ_RESOURCE] %s", uri)
-    if uri != WIDGET.template_uri:
-        logger.warning("[READ_RESOURCE] unknown uri=%s (expected %s)", uri, WIDGET.template_uri)
-        return types.ServerResult(
-            types.ReadResourceResult(contents=[], _meta={"error": f"Unknown resource: {uri}"})
-        )
+@functools.lru_cache(maxsize=1)
+def _widget_read_result() -> types.ServerResult:
+    """The widget resource never changes within a process; build the result once."""
     html = _load_widget_html()
-    logger.info("[READ_RESOURCE] served html length=%d preview=%r", len(html), html[:80])
     contents = [
         types.TextResourceContents(
-            uri=WIDGET.template_uri,
+            uri=_TEMPLATE_URI,
             mimeType=MIME_TYPE,
             text=html,
-            title=WIDGET.title,
+            title=_TITLE,
             _meta={
                 "openai/widgetDescription": "Scrollable News Impact carousel",
                 "openai/widgetPrefersBorder": True,
                 "openai/widgetCSP": {"connect_domains": [], "resource_domains": []},
+                # content hash: lets hosts that cache by URI tell whether the template changed
+                "etag": hashlib.blake2b(html.encode("utf-8"), digest_size=8).hexdigest(),
             },
         )
     ]
     return types.ServerResult(types.ReadResourceResult(contents=contents))
 
+async def _handle_read_resource(req: types.ReadResourceRequest) -> types.ServerResult:
+    uri = str(req.params.uri)
+    logger.info("[READ_RESOURCE] %s", uri)
+    if uri != _TEMPLATE_URI:
+        logger.warning("[READ_RESOURCE] unknown uri=%s (expected %s)", uri, _TEMPLATE_URI)
+        return types.ServerResult(
+            types.ReadResourceResult(contents=[], _meta={"error": f"Unknown resource: {uri}"})
+        )
+    result = _widget_read_result()
+    logger.info("[READ_RESOURCE] served html length=%d", len(result.root.contents[0].text))
+    return result
+
 async def _call_tool_request(req: types.CallToolRequest) -> types.ServerResult:
     tool_name = req.params.name
     args = req.params.arguments or {}
-    logger.debug("[CALL_TOOL] %s args=%s", tool_name, json.dumps(args, default=str))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[CALL_TOOL] %s args=%s", tool_name, _LazyJSON(args))
 
     if tool_name != "news-impact":
         return types.ServerResult(
@@ -337,8 +601,7 @@ async def _call_tool_request(req: types.CallToolRequest) -> types.ServerResult:
 
     try:
         query, limit = _validate_and_normalize_args(args)
-        docs = _fetch_from_mongo(query, limit)
-        normalized = _normalize_docs(docs)
+        normalized = await _fetch_items(query, limit)
     except ValidationError as ve:
         logger.warning("[CALL_TOOL] validation error: %s", ve)
         return types.ServerResult(
@@ -365,39 +628,31 @@ async def _call_tool_request(req: types.CallToolRequest) -> types.ServerResult:
         )
 
     logger.info("[CALL_TOOL] normalized=%d", len(normalized))
-    if normalized:
+    if normalized and logger.isEnabledFor(logging.DEBUG):
         logger.debug("[CALL_TOOL] first item: %s", _preview(normalized[0]))
 
     # No results → no widget
     if not normalized:
         return types.ServerResult(
             types.CallToolResult(
-                content=[types.TextContent(type="text", text="No news matched your query. Widget not rendered.")],
+                content=_NO_RESULTS_CONTENT,
                 structuredContent={"items": []},
             )
         )
 
     # Results found → enable widget rendering now
-    result_meta = {
-        "openai/widgetAccessible": True,
-        "openai/resultCanProduceWidget": True,
-        "openai/outputTemplate": WIDGET.template_uri,
-        "openai/toolInvocation/invoking": WIDGET.invoking,
-        "openai/toolInvocation/invoked": WIDGET.invoked,
-        "openai/widgetId": WIDGET.identifier,  # optional helper for hosts
-    }
     logger.info(
         "[CALL_TOOL] enabling widget (widgetAccessible=%s, resultCanProduceWidget=%s) items=%d",
-        result_meta["openai/widgetAccessible"],
-        result_meta["openai/resultCanProduceWidget"],
+        _RESULT_META_WITH_WIDGET["openai/widgetAccessible"],
+        _RESULT_META_WITH_WIDGET["openai/resultCanProduceWidget"],
         len(normalized),
     )
 
     return types.ServerResult(
         types.CallToolResult(
-            content=[types.TextContent(type="text", text=f"Fetched {len(normalized)} item(s) for News Impact.")],
+            content=_FETCHED_CONTENT[len(normalized)],
             structuredContent={"items": normalized},
-            _meta=result_meta,
+            _meta=_RESULT_META_WITH_WIDGET,
         )
     )
 
@@ -405,22 +660,61 @@ async def _call_tool_request(req: types.CallToolRequest) -> types.ServerResult:
 mcp._mcp_server.request_handlers[types.CallToolRequest] = _call_tool_request
 mcp._mcp_server.request_handlers[types.ReadResourceRequest] = _handle_read_resource
 
+# ============================================================
+# Startup warm-up
+# ============================================================
+
+def _warm_up() -> None:
+    """Pay first-request costs up front: widget read, validator, Mongo handshake."""
+    _widget_read_result()
+    _VALIDATE_ARGS({"query": {"sentiment": "Positive"}})
+    try:
+        _get_coll().database.command("ping")
+        logger.info("[STARTUP] Mongo ping ok")
+    except PyMongoError as e:
+        logger.warning("[STARTUP] Mongo warm-up failed: %s", e)
+
 # Expose ASGI app
 app = mcp.streamable_http_app()
 
-# Optional: CORS for local dev / preview
-try:
-    from starlette.middleware.cors import CORSMiddleware
-    app.add_middleware(
+# Run the warm-up inside the app lifespan so it happens in every worker process
+_mcp_lifespan = app.router.lifespan_context
+
+@contextlib.asynccontextmanager
+async def _lifespan(app_):
+    await asyncio.to_thread(_warm_up)
+    async with _mcp_lifespan(app_) as state:
+        yield state
+
+app.router.lifespan_context = _lifespan
+
+# Middleware, outermost first: CORS for local dev / preview, then gzip for the JSON replies
+# (json_response=True above; Starlette never compresses text/event-stream). Registered before
+# the first request, when Starlette builds the stack once.
+app.user_middleware[:0] = [
+    Middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_methods=["*"],
         allow_headers=["*"],
         allow_credentials=False,
-    )
-except Exception:
-    pass
+    ),
+    Middleware(GZipMiddleware, minimum_size=500, compresslevel=5),
+]
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("mcp_server:app", host="0.0.0.0", port=8000, reload=False)
+    # loop/http default to "auto": uvloop + httptools when installed (uvicorn[standard]).
+    # Each worker builds its own Mongo client lazily, after the process starts.
+    uvicorn.run(
+        "mcp_server:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=False,
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        backlog=2048,
+        timeout_keep_alive=30,
+        # keep uvicorn (and its per-request access log) in step with LOG_LEVEL; numeric, since
+        # uvicorn's name table lacks aliases logging accepts (WARN, FATAL, NOTSET)
+        log_level=logger.getEffectiveLevel(),
+    )